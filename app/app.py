@@ -1,52 +1,174 @@
-from flask import Flask, render_template, request, redirect, flash, url_for
-from app.db import get_notes, add_note, delete_note, update_note
+from flask import (Flask, Response, render_template, stream_template, stream_with_context,
+                   request, redirect, flash, url_for, jsonify)
+from flask_caching import Cache
+import logging
+import threading
+import time
+from app.db import (init_database, iter_notes, get_notes_count, add_note, add_notes,
+                    delete_note, update_note, NOTES_PER_PAGE)
+
+logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
 app.secret_key = 'your-secret-key-here'  # Add this for flash messages
 
+# Per-process cache; use RedisCache if running more than one worker process
+cache = Cache(app, config={'CACHE_TYPE': 'SimpleCache'})
+INDEX_CACHE_KEY = 'view//?page=%d'
+INDEX_CACHE_TIMEOUT = 60
+
+# Bumped on every invalidation so a page rendered from rows read before a
+# write is never stored after that write has cleared the cache
+_index_generation = 0
+_index_generation_lock = threading.Lock()
+
+def invalidate_index():
+    """Drop every cached index page; adding or removing a note shifts them all"""
+    global _index_generation
+    with _index_generation_lock:
+        _index_generation += 1
+        cache.clear()
+
+DB_INIT_RETRY_SECONDS = 5
+
+_db_initialized = False
+_db_init_failed_at = None
+_db_init_lock = threading.Lock()
+
+def _db_init_backing_off():
+    return (_db_init_failed_at is not None
+            and time.monotonic() - _db_init_failed_at < DB_INIT_RETRY_SECONDS)
+
+@app.before_request
+def ensure_database():
+    """Create the schema once per process, on the first request.
+
+    After a failure, retries wait DB_INIT_RETRY_SECONDS so requests don't
+    all queue behind connection attempts while MySQL is down.
+    """
+    global _db_initialized, _db_init_failed_at
+    if _db_initialized or _db_init_backing_off():
+        return
+    with _db_init_lock:
+        if _db_initialized or _db_init_backing_off():
+            return
+        try:
+            init_database()
+            _db_initialized = True
+        except Exception as e:
+            _db_init_failed_at = time.monotonic()
+            logger.error("Failed to initialize database: %s", e)
+
+@app.cli.command('init-db')
+def init_db_command():
+    """Create the notes table and migrate its indexes."""
+    init_database(migrate=True)
+
+@app.template_filter('fmtdate')
+def fmtdate(dt):
+    """Format a note timestamp for display"""
+    return dt.strftime('%Y-%m-%d %H:%M') if dt else ''
+
+def _stream_and_cache(key, chunks, generation):
+    """Yield rendered chunks to the client, caching the page once it completes.
+
+    The page is only cached if no note was changed since its rows were read.
+    """
+    rendered = []
+    try:
+        for chunk in chunks:
+            rendered.append(chunk)
+            yield chunk
+    except Exception as e:
+        # Headers are already sent; end the page and don't cache it
+        logger.error("Error streaming index page: %s", e)
+        return
+    with _index_generation_lock:
+        if generation == _index_generation:
+            cache.set(key, ''.join(rendered), timeout=INDEX_CACHE_TIMEOUT)
+
 @app.route('/')
 def index():
+    page = max(request.args.get('page', 1, type=int), 1)
+    cache_key = INDEX_CACHE_KEY % page
+    cached = cache.get(cache_key)
+    if cached is not None:
+        return cached
+    
+    # Read before the count and rows: a page built from either one before a
+    # write finished is then not cached. This relies on get_notes_count()
+    # not storing a count that raced the write (see its version check)
+    generation = _index_generation
+    # Only in-range pages are ever cached, so a hit above is always valid
+    total_pages = max(1, -(-get_notes_count() // NOTES_PER_PAGE))
+    if page > total_pages:
+        return redirect(url_for('index', page=total_pages))
+    
     try:
-        notes = get_notes()
-        print(f"Retrieved {len(notes)} notes from database")  # Debug print
-        return render_template('index.html', notes=notes)
+        notes = iter_notes(page)
     except Exception as e:
-        print(f"Error in index route: {e}")
+        logger.error("Error in index route: %s", e)
         flash('Error loading notes', 'error')
-        return render_template('index.html', notes=[])
+        return render_template('index.html', notes=[], page=page, total_pages=1)
+    
+    # Rows are rendered as they arrive from MySQL instead of being loaded
+    # into a list first; the connection goes back to the pool on close
+    logger.debug("Streaming notes from database")
+    chunks = stream_template('index.html', notes=notes, page=page, total_pages=total_pages)
+    response = Response(stream_with_context(_stream_and_cache(cache_key, chunks, generation)))
+    response.call_on_close(notes.close)
+    return response
 
 @app.route('/add', methods=['POST'])
 def add():
     try:
         content = request.form.get('content')
-        print(f"Adding note with content: {content[:50]}...")  # Debug print
+        logger.debug("Adding note with content: %.50s...", content)
         if content:
             success = add_note(content)
             if success:
+                invalidate_index()
                 flash('Note added successfully!', 'success')
             else:
                 flash('Error adding note', 'error')
         else:
             flash('Note content cannot be empty', 'error')
     except Exception as e:
-        print(f"Error in add route: {e}")
+        logger.error("Error in add route: %s", e)
         flash('Error adding note', 'error')
     
     return redirect(url_for('index'))
 
+@app.route('/add_bulk', methods=['POST'])
+def add_bulk():
+    contents = request.get_json(silent=True)
+    if not isinstance(contents, list) or not all(isinstance(c, str) for c in contents):
+        return jsonify(error='Expected a JSON array of strings'), 400
+    
+    logger.debug("Adding %d notes in bulk", len(contents))
+    added = add_notes(contents)
+    if added is None:
+        return jsonify(error='Error adding notes'), 500
+    if not added:
+        return jsonify(error='Note content cannot be empty'), 400
+    
+    invalidate_index()
+    return jsonify(added=added)
+
 @app.route('/delete/<int:note_id>', methods=['POST'])
 def delete(note_id):
     try:
-        print(f"Attempting to delete note with ID: {note_id}")  # Debug print
+        logger.debug("Attempting to delete note with ID: %s", note_id)
         success = delete_note(note_id)
         if success:
+            invalidate_index()
             flash('Note deleted successfully!', 'success')
-            print(f"Successfully deleted note {note_id}")
+            logger.debug("Successfully deleted note %s", note_id)
         else:
             flash('Error deleting note', 'error')
-            print(f"Failed to delete note {note_id}")
+            logger.debug("Failed to delete note %s", note_id)
     except Exception as e:
-        print(f"Error in delete route: {e}")
+        logger.error("Error in delete route: %s", e)
         flash('Error deleting note', 'error')
     
     return redirect(url_for('index'))
@@ -55,24 +177,25 @@ def delete(note_id):
 def edit(note_id):
     try:
         new_content = request.form.get('content')
-        print(f"Attempting to edit note {note_id} with content: {new_content[:50]}...")  # Debug print
+        logger.debug("Attempting to edit note %s with content: %.50s...", note_id, new_content)
         
         if new_content:
             success = update_note(note_id, new_content)
             if success:
+                invalidate_index()
                 flash('Note updated successfully!', 'success')
-                print(f"Successfully updated note {note_id}")
+                logger.debug("Successfully updated note %s", note_id)
             else:
                 flash('Error updating note', 'error')
-                print(f"Failed to update note {note_id}")
+                logger.debug("Failed to update note %s", note_id)
         else:
             flash('Note content cannot be empty', 'error')
-            print("Edit failed: empty content")
+            logger.debug("Edit failed: empty content")
     except Exception as e:
-        print(f"Error in edit route: {e}")
+        logger.error("Error in edit route: %s", e)
         flash('Error updating note', 'error')
     
     return redirect(url_for('index'))
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=80, debug=True)  # Enable debug mode
+    app.run(host='0.0.0.0', port=80)
@@ -1,30 +1,101 @@
-import mysql.connector
+import MySQLdb
+import MySQLdb.cursors
+from MySQLdb.constants import CLIENT
 import os
 from datetime import datetime
 import logging
+import queue
+import threading
+from cachetools import TTLCache
 
-# Set up logging for database operations
-logging.basicConfig(level=logging.INFO)
+# Set up logging; keep the default quiet so debug messages aren't formatted
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "WARNING").upper())
 logger = logging.getLogger(__name__)
 
+POOL_SIZE = int(os.getenv("POOL_SIZE", "10"))
+CONNECT_TIMEOUT = int(os.getenv("DB_CONNECT_TIMEOUT", "5"))
+NOTES_PER_PAGE = max(int(os.getenv("NOTES_PER_PAGE", "50")), 1)
+NOTES_FETCH_SIZE = 100
+NOTES_COUNT_TTL = 30
+
+def _connect():
+    """Open a new MySQL database connection"""
+    return MySQLdb.connect(
+        host="db",
+        user=os.getenv("MYSQL_USER"),
+        password=os.getenv("MYSQL_PASSWORD"),
+        database=os.getenv("MYSQL_DATABASE"),
+        charset='utf8mb4',
+        collation='utf8mb4_unicode_ci',
+        connect_timeout=CONNECT_TIMEOUT,
+        # Report matched rather than changed rows, so an UPDATE that leaves
+        # a note unchanged still counts as found
+        client_flag=CLIENT.FOUND_ROWS,
+        # Sessions are reused without a reset, so autocommit keeps a read
+        # from pinning a stale snapshot for the next borrower
+        autocommit=True
+    )
+
+# COUNT(*) scans the primary key, so keep the last result for a while;
+# add/delete also drop it so it only drifts on changes made elsewhere.
+# The version is bumped on every invalidation so a COUNT that raced a
+# write can't store its stale result afterwards
+_count_cache = TTLCache(maxsize=1, ttl=NOTES_COUNT_TTL)
+_count_cache_version = 0
+_count_cache_lock = threading.Lock()
+
+# Idle connections, most recently used first. Connections are opened on
+# demand, so importing this module doesn't touch MySQL
+_pool = queue.LifoQueue(maxsize=POOL_SIZE)
+
+def _close_quietly(resource):
+    """Close a cursor or connection, ignoring errors from an already-dead one"""
+    try:
+        resource.close()
+    except MySQLdb.Error:
+        pass
+
 def get_connection():
-    """Create and return a MySQL database connection"""
+    """Borrow a MySQL connection from the pool (hand it back with _release())"""
+    try:
+        conn = _pool.get_nowait()
+    except queue.Empty:
+        conn = None
+        
+    if conn is not None:
+        try:
+            # Pooled connections can be dropped by the server after wait_timeout
+            conn.ping()
+            return conn
+        except MySQLdb.Error:
+            _close_quietly(conn)
+            
     try:
-        return mysql.connector.connect(
-            host="db",
-            user=os.getenv("MYSQL_USER"),
-            password=os.getenv("MYSQL_PASSWORD"),
-            database=os.getenv("MYSQL_DATABASE"),
-            charset='utf8mb4',
-            collation='utf8mb4_unicode_ci',
-            autocommit=False
-        )
-    except mysql.connector.Error as err:
-        logger.error(f"Database connection error: {err}")
+        return _connect()
+    except MySQLdb.Error as err:
+        logger.error("Database connection error: %s", err)
         raise
 
-def init_database():
-    """Initialize the database and create tables if they don't exist"""
+def _release(conn, cursor=None):
+    """Close cursor and return conn to the pool.
+
+    There's no is_connected()-style check first; that would cost a ping
+    round trip on every call, and get_connection() pings before reuse.
+    """
+    if cursor is not None:
+        _close_quietly(cursor)
+    if conn is not None:
+        try:
+            _pool.put_nowait(conn)
+        except queue.Full:
+            _close_quietly(conn)
+
+def init_database(migrate=False):
+    """Initialize the database and create tables if they don't exist.
+
+    Index migrations on an existing table only run when migrate is set.
+    """
+    conn = cursor = None
     try:
         conn = get_connection()
         cursor = conn.cursor()
@@ -36,47 +107,110 @@ def init_database():
             content TEXT NOT NULL,
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
-            INDEX idx_created_at (created_at)
+            INDEX idx_created_at_desc (created_at DESC, id DESC)
         ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
         """
         
         cursor.execute(create_table_query)
+        
+        # Tables created before the listing index existed need it added, and
+        # the index it replaces dropped so writes stop maintaining it
+        cursor.execute("""
+        SELECT DISTINCT index_name FROM information_schema.statistics 
+        WHERE table_schema = DATABASE() AND table_name = 'notes' 
+          AND index_name IN ('idx_created_at_desc', 'idx_created_at')
+        """)
+        indexes = {row[0] for row in cursor.fetchall()}
+        changes = []
+        if 'idx_created_at_desc' not in indexes:
+            changes.append("ADD INDEX idx_created_at_desc (created_at DESC, id DESC)")
+        if 'idx_created_at' in indexes:
+            changes.append("DROP INDEX idx_created_at")
+        if changes and migrate:
+            cursor.execute("ALTER TABLE notes " + ", ".join(changes))
+            logger.info("Migrated notes indexes: %s", ", ".join(changes))
+        elif changes:
+            # Building an index on a large table can take a while, so leave
+            # it to the deploy step rather than the request path
+            logger.warning("notes table indexes are out of date; run 'flask init-db'")
         conn.commit()
         logger.info("Database initialized successfully")
         
-    except mysql.connector.Error as err:
-        logger.error(f"Error initializing database: {err}")
+    except MySQLdb.Error as err:
+        logger.error("Error initializing database: %s", err)
         raise
     finally:
-        if conn.is_connected():
-            cursor.close()
-            conn.close()
+        _release(conn, cursor)
+
+NOTES_QUERY = """
+SELECT id, content, created_at 
+FROM notes 
+ORDER BY created_at DESC, id DESC
+LIMIT %s OFFSET %s
+"""
+
+class NoteStream:
+    """Iterator over note rows streamed from MySQL in batches.
+
+    Holds its pooled connection until the rows are exhausted or close() is
+    called, so callers that may stop early must close it.
+    """
+
+    def __init__(self, conn, cursor):
+        self._conn = conn
+        self._cursor = cursor
+        self._closed = False
+        self._rows = self._fetch()
 
-def get_notes():
-    """Retrieve all notes ordered by creation date (newest first)"""
-    conn = None
+    def _fetch(self):
+        while True:
+            rows = self._cursor.fetchmany(NOTES_FETCH_SIZE)
+            if not rows:
+                self.close()
+                return
+            yield from rows
+
+    def __iter__(self):
+        return self._rows
+
+    def close(self):
+        """Return the connection to the pool (safe to call more than once)"""
+        if self._closed:
+            return
+        self._closed = True
+        # Closing an SSCursor reads off any rows left unread on the connection
+        _release(self._conn, self._cursor)
+
+def iter_notes(page=1):
+    """Stream one page of notes (newest first) without buffering them all.
+
+    Connection and query errors are raised here rather than mid-iteration.
+    """
+    conn = get_connection()
+    # SSCursor leaves the result on the server and reads it as it's fetched
+    cursor = conn.cursor(MySQLdb.cursors.SSCursor)
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        
-        query = """
-        SELECT id, content, DATE_FORMAT(created_at, '%Y-%m-%d %H:%i') as formatted_date 
-        FROM notes 
-        ORDER BY created_at DESC
-        """
-        
-        cursor.execute(query)
-        notes = cursor.fetchall()
-        logger.info(f"Retrieved {len(notes)} notes")
-        return notes
+        cursor.execute(NOTES_QUERY, (NOTES_PER_PAGE, (page - 1) * NOTES_PER_PAGE))
+    except MySQLdb.Error:
+        _release(conn, cursor)
+        raise
+    return NoteStream(conn, cursor)
+
+def get_notes(page=1):
+    """Retrieve one page of notes ordered by creation date (newest first)"""
+    notes = None
+    try:
+        notes = iter_notes(page)
+        rows = list(notes)
+        logger.info("Retrieved %d notes", len(rows))
+        return rows
         
-    except mysql.connector.Error as err:
-        logger.error(f"Error retrieving notes: {err}")
+    except MySQLdb.Error as err:
+        logger.error("Error retrieving notes: %s", err)
         return []
     finally:
-        if conn and conn.is_connected():
-            cursor.close()
-            conn.close()
+        if notes is not None:
+            notes.close()
 
 def add_note(content):
     """Add a new note to the database"""
@@ -84,129 +218,154 @@ def add_note(content):
         logger.warning("Attempted to add empty note")
         return False
         
-    conn = None
+    conn = cursor = None
     try:
         conn = get_connection()
-        cursor = conn.cursor()
         
         # Trim whitespace from content
         content = content.strip()
         
         query = "INSERT INTO notes (content) VALUES (%s)"
+        cursor = conn.cursor()
         cursor.execute(query, (content,))
         conn.commit()
         
         note_id = cursor.lastrowid
-        logger.info(f"Added new note with ID: {note_id}")
+        logger.info("Added new note with ID: %s", note_id)
+        _invalidate_notes_count()
         return True
         
-    except mysql.connector.Error as err:
-        logger.error(f"Error adding note: {err}")
+    except MySQLdb.Error as err:
+        logger.error("Error adding note: %s", err)
         if conn:
             conn.rollback()
         return False
     finally:
-        if conn and conn.is_connected():
-            cursor.close()
-            conn.close()
+        _release(conn, cursor)
+
+def add_notes(contents):
+    """Add several notes in one transaction.
+
+    Returns how many were added (0 if none were non-empty), or None if the
+    insert failed and was rolled back.
+    """
+    contents = [c.strip() for c in contents or [] if c and c.strip()]
+    if not contents:
+        logger.warning("Attempted to add an empty batch of notes")
+        return 0
+        
+    conn = cursor = None
+    try:
+        conn = get_connection()
+        cursor = conn.cursor()
+        conn.begin()
+        
+        # executemany rewrites this into multi-row INSERTs, splitting them at
+        # the driver's max_stmt_length
+        query = "INSERT INTO notes (content) VALUES (%s)"
+        cursor.executemany(query, [(content,) for content in contents])
+        conn.commit()
+        
+        logger.info("Added %d notes", len(contents))
+        _invalidate_notes_count()
+        return len(contents)
+        
+    except Exception as err:
+        # Catch broadly: any error after begin() must roll back, or the open
+        # transaction would go back to the pool for the next borrower
+        logger.error("Error adding notes: %s", err)
+        if conn:
+            try:
+                conn.rollback()
+            except MySQLdb.Error:
+                # The transaction may still be open; don't pool the connection
+                _close_quietly(conn)
+                conn = None
+        return None
+    finally:
+        _release(conn, cursor)
 
 def delete_note(note_id):
     """Delete a note by its ID"""
     if not note_id or note_id <= 0:
-        logger.warning(f"Invalid note ID for deletion: {note_id}")
+        logger.warning("Invalid note ID for deletion: %s", note_id)
         return False
         
-    conn = None
+    conn = cursor = None
     try:
         conn = get_connection()
-        cursor = conn.cursor()
         
-        # Check if note exists first
-        cursor.execute("SELECT id FROM notes WHERE id = %s", (note_id,))
-        if not cursor.fetchone():
-            logger.warning(f"Note with ID {note_id} not found")
-            return False
-        
-        # Delete the note
+        # rowcount tells us whether the note existed, no need to look it up first
         query = "DELETE FROM notes WHERE id = %s"
+        cursor = conn.cursor()
         cursor.execute(query, (note_id,))
         conn.commit()
         
         deleted_rows = cursor.rowcount
         if deleted_rows > 0:
-            logger.info(f"Deleted note with ID: {note_id}")
+            logger.info("Deleted note with ID: %s", note_id)
+            _invalidate_notes_count()
             return True
         else:
-            logger.warning(f"No note deleted with ID: {note_id}")
+            logger.warning("Note with ID %s not found", note_id)
             return False
             
-    except mysql.connector.Error as err:
-        logger.error(f"Error deleting note {note_id}: {err}")
+    except MySQLdb.Error as err:
+        logger.error("Error deleting note %s: %s", note_id, err)
         if conn:
             conn.rollback()
         return False
     finally:
-        if conn and conn.is_connected():
-            cursor.close()
-            conn.close()
+        _release(conn, cursor)
 
 def update_note(note_id, new_content):
     """Update a note's content by its ID"""
     if not note_id or note_id <= 0:
-        logger.warning(f"Invalid note ID for update: {note_id}")
+        logger.warning("Invalid note ID for update: %s", note_id)
         return False
         
     if not new_content or not new_content.strip():
         logger.warning("Attempted to update note with empty content")
         return False
         
-    conn = None
+    conn = cursor = None
     try:
         conn = get_connection()
-        cursor = conn.cursor()
-        
-        # Check if note exists first
-        cursor.execute("SELECT id FROM notes WHERE id = %s", (note_id,))
-        if not cursor.fetchone():
-            logger.warning(f"Note with ID {note_id} not found")
-            return False
         
         # Trim whitespace from content
         new_content = new_content.strip()
         
         # Update the note (updated_at will be automatically set by MySQL)
         query = "UPDATE notes SET content = %s WHERE id = %s"
+        cursor = conn.cursor()
         cursor.execute(query, (new_content, note_id))
         conn.commit()
         
         updated_rows = cursor.rowcount
         if updated_rows > 0:
-            logger.info(f"Updated note with ID: {note_id}")
+            logger.info("Updated note with ID: %s", note_id)
             return True
         else:
-            logger.warning(f"No note updated with ID: {note_id}")
+            logger.warning("Note with ID %s not found", note_id)
             return False
             
-    except mysql.connector.Error as err:
-        logger.error(f"Error updating note {note_id}: {err}")
+    except MySQLdb.Error as err:
+        logger.error("Error updating note %s: %s", note_id, err)
         if conn:
             conn.rollback()
         return False
     finally:
-        if conn and conn.is_connected():
-            cursor.close()
-            conn.close()
+        _release(conn, cursor)
 
 def get_note_by_id(note_id):
     """Get a single note by its ID"""
     if not note_id or note_id <= 0:
-        logger.warning(f"Invalid note ID: {note_id}")
+        logger.warning("Invalid note ID: %s", note_id)
         return None
         
-    conn = None
+    conn = cursor = None
     try:
         conn = get_connection()
-        cursor = conn.cursor()
         
         query = """
         SELECT id, content, created_at, updated_at 
@@ -214,47 +373,55 @@ def get_note_by_id(note_id):
         WHERE id = %s
         """
         
+        cursor = conn.cursor()
         cursor.execute(query, (note_id,))
         note = cursor.fetchone()
         
         if note:
-            logger.info(f"Retrieved note with ID: {note_id}")
+            logger.info("Retrieved note with ID: %s", note_id)
         else:
-            logger.warning(f"Note with ID {note_id} not found")
+            logger.warning("Note with ID %s not found", note_id)
             
         return note
         
-    except mysql.connector.Error as err:
-        logger.error(f"Error retrieving note {note_id}: {err}")
+    except MySQLdb.Error as err:
+        logger.error("Error retrieving note %s: %s", note_id, err)
         return None
     finally:
-        if conn and conn.is_connected():
-            cursor.close()
-            conn.close()
+        _release(conn, cursor)
+
+def _invalidate_notes_count():
+    """Forget the cached note count after notes are added or removed"""
+    global _count_cache_version
+    with _count_cache_lock:
+        _count_cache_version += 1
+        _count_cache.pop('count', None)
 
 def get_notes_count():
-    """Get the total number of notes"""
-    conn = None
+    """Get the total number of notes (cached for NOTES_COUNT_TTL seconds)"""
+    with _count_cache_lock:
+        count = _count_cache.get('count')
+        version = _count_cache_version
+    if count is not None:
+        return count
+        
+    conn = cursor = None
     try:
         conn = get_connection()
-        cursor = conn.cursor()
         
-        cursor.execute("SELECT COUNT(*) FROM notes")
+        query = "SELECT COUNT(*) FROM notes"
+        cursor = conn.cursor()
+        cursor.execute(query)
         count = cursor.fetchone()[0]
-        logger.info(f"Total notes count: {count}")
+        logger.info("Total notes count: %s", count)
+        with _count_cache_lock:
+            if version == _count_cache_version:
+                _count_cache['count'] = count
         return count
         
-    except mysql.connector.Error as err:
-        logger.error(f"Error getting notes count: {err}")
+    except MySQLdb.Error as err:
+        logger.error("Error getting notes count: %s", err)
         return 0
     finally:
-        if conn and conn.is_connected():
-            cursor.close()
-            conn.close()
+        _release(conn, cursor)
 
-# Initialize database when module is imported
-if __name__ != '__main__':
-    try:
-        init_database()
-    except Exception as e:
-        logger.error(f"Failed to initialize database: {e}")